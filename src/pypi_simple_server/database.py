@@ -1,10 +1,13 @@
 import logging
-import queue
+import os
 import sqlite3
+import threading
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from dataclasses import KW_ONLY, dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Self
 
@@ -28,6 +31,7 @@ BUILD_TABLE = """
         "file" ProjectFile NOT NULL
     );
     CREATE INDEX IF NOT EXISTS project_lookup ON Distribution("project", "index");
+    CREATE INDEX IF NOT EXISTS index_lookup ON Distribution("index", "project");
     CREATE UNIQUE INDEX IF NOT EXISTS file_lookup ON Distribution("filename", "index");
 """
 
@@ -37,30 +41,39 @@ GET_STATS = """
 """
 
 GET_STATS_PER_INDEX = """
-    SELECT "index", "project", "file" AS "file [ProjectFile]"
+    SELECT "index", "project", "file"
     FROM Distribution
 """
 
 GET_PROJECT_LIST = """
     SELECT DISTINCT "project"
     FROM Distribution
-    WHERE "index" GLOB ?
+    WHERE "index" >= ? AND "index" < ?
+    ORDER BY "project"
+"""
+
+GET_PROJECT_LIST_ALL = """
+    SELECT DISTINCT "project"
+    FROM Distribution
     ORDER BY "project"
 """
 
 GET_PROJECT_DETAIL = """
-    SELECT "version", "file" AS "file [ProjectFile]"
+    SELECT "version", "file"
     FROM Distribution
-    WHERE "project" = ? AND "index" GLOB ?
+    WHERE "project" = ? AND "index" >= ? AND "index" < ?
     GROUP BY "filename"
     HAVING ROWID = MIN(ROWID)
     ORDER BY "filename"
 """
 
-CHECK_DIST = """
-    SELECT "index", "sha256"
+GET_PROJECT_DETAIL_ALL = """
+    SELECT "version", "file"
     FROM Distribution
-    WHERE "filename" = ?
+    WHERE "project" = ?
+    GROUP BY "filename"
+    HAVING ROWID = MIN(ROWID)
+    ORDER BY "filename"
 """
 
 CHECK_DIST_EXISTS = """
@@ -84,8 +97,25 @@ REMOVE_DIST = """
     WHERE "filename" = ? AND "index" = ?
 """
 
-sqlite3.register_adapter(ProjectFile, msgspec.msgpack.Encoder().encode)
-sqlite3.register_converter("ProjectFile", msgspec.msgpack.Decoder(ProjectFile).decode)
+TUNE_CONNECTION = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+"""
+
+TUNE_JOURNAL = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+"""
+
+_PROJECT_FILE_ENCODER = msgspec.msgpack.Encoder()
+_PROJECT_FILE_DECODER = msgspec.msgpack.Decoder(ProjectFile)
+
+sqlite3.register_adapter(ProjectFile, _PROJECT_FILE_ENCODER.encode)
+
+
+def _stats_per_index_row(cursor: sqlite3.Cursor, row: tuple[str, str, bytes]) -> tuple[str, str, ProjectFile]:
+    return row[0], row[1], _PROJECT_FILE_DECODER.decode(row[2])
 
 
 class Stats(msgspec.Struct, frozen=True):
@@ -113,49 +143,57 @@ class Database:
     filepath: Path
     _: KW_ONLY
     read_only: bool = True
-    max_num_connections: int = 4
+    max_num_connections: int | None = None  # default: scale with CPU count
 
     def __post_init__(self):
-        self._connections = queue.Queue[sqlite3.Connection]()
-        self._limiter = CapacityLimiter(self.max_num_connections)
+        mode = "?mode=ro" if self.read_only else ""
+        self._uri = f"file://{self.filepath.absolute()}{mode}"
+        max_connections = self.max_num_connections or min(32, 2 * (os.cpu_count() or 4))
+        self._limiter = CapacityLimiter(max_connections)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open_connections: list[sqlite3.Connection] = []
+        self._stats_cache: tuple[int, dict[str, IndexStats]] | None = None
 
     def __enter__(self) -> Self:
         return self
 
     def __exit__(self, *exc_info):
-        self._connections.shutdown()
-        try:
-            while con := self._connections.get():
+        with self._lock:
+            for con in self._open_connections:
                 con.close()
-        except queue.ShutDown:
-            pass  # queue empty
+            self._open_connections.clear()
+            self._local = threading.local()
 
     def _create_connection(self) -> sqlite3.Connection:
-        mode = "?mode=ro" if self.read_only else ""
         con = sqlite3.connect(
-            f"file://{self.filepath.absolute()}{mode}",
+            self._uri,
             uri=True,
-            detect_types=sqlite3.PARSE_COLNAMES,
-            autocommit=False,
+            autocommit=True,  # switched below, PRAGMAs must run outside a transaction
             check_same_thread=False,
+            # connections are long-lived, so keep all statements prepared
+            cached_statements=128,
         )
+        con.executescript(TUNE_CONNECTION).close()
         if not self.read_only:
+            con.executescript(TUNE_JOURNAL).close()
             con.executescript(BUILD_TABLE).close()
+        con.autocommit = False
         return con
 
     @contextmanager
     def _get_connection(self) -> Iterator[sqlite3.Connection]:
-        con = None
-        try:
-            try:
-                con = self._connections.get_nowait()
-            except queue.Empty:
-                con = self._create_connection()
-            with con:
-                yield con
-        finally:
-            if con is not None:
-                self._connections.put(con)
+        # pin one connection per worker thread so its page and statement
+        # caches stay with the thread instead of bouncing through a pool;
+        # WAL readers never block each other, and the commit on exit
+        # releases the read transaction so later requests see updates
+        con: sqlite3.Connection | None = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = self._create_connection()
+            with self._lock:
+                self._open_connections.append(con)
+        with con:
+            yield con
 
     def stats(self) -> Stats:
         with self._get_connection() as con:
@@ -163,19 +201,25 @@ class Database:
 
     def stats_per_index(self) -> dict[str, IndexStats]:
         with self._get_connection() as con:
+            # recompute only when another connection has committed changes
+            (data_version,) = con.execute("PRAGMA data_version").fetchone()
+            if self._stats_cache is not None and self._stats_cache[0] == data_version:
+                return self._stats_cache[1]
+
             per_index = dict[str, _StatsPerIndexCollector]()
             dist: ProjectFile
-            for index, project, dist in con.execute(GET_STATS_PER_INDEX).fetchall():
+            cursor = con.execute(GET_STATS_PER_INDEX)
+            cursor.row_factory = _stats_per_index_row
+            for index, project, dist in cursor.fetchall():
                 mtime = datetime.fromisoformat(dist.upload_time).timestamp() if dist.upload_time else 0
-                while index:
-                    index = index.rpartition("/")[0]
-                    stats = per_index.setdefault(index, _StatsPerIndexCollector())
+                for name in _index_ancestors(index):
+                    stats = per_index.setdefault(name, _StatsPerIndexCollector())
                     stats.projects.add(project)
                     stats.files.add(dist.filename)
                     stats.size += dist.size
                     stats.mtime = max(stats.mtime, mtime)
 
-            return {
+            result = {
                 name: IndexStats(
                     projects=len(stats.projects),
                     files=len(stats.files),
@@ -184,6 +228,8 @@ class Database:
                 )
                 for name, stats in sorted(per_index.items())
             }
+            self._stats_cache = (data_version, result)
+            return result
 
     async def update(
         self, project_file_reader: ProjectFileReader, static_files: StaticFilesDirGenerator
@@ -191,43 +237,76 @@ class Database:
         def run() -> None:
             with self._get_connection() as con:
                 _add_new(con, project_file_reader, static_files)
-                _remove_missing(con, project_file_reader.base_dir, static_files)
+                _remove_missing(con, project_file_reader, static_files)
 
             self.filepath.touch(exist_ok=True)
 
         return await to_thread.run_sync(run, limiter=self._limiter)
 
     async def get_project_list(self, index: str) -> ProjectList:
-        def run() -> ProjectList:
-            with self._get_connection() as con:
-                cursor = con.execute(GET_PROJECT_LIST, (_path_pattern(index),))
-                return ProjectList(projects=[Project(name) for (name,) in cursor])
+        sql, params = _project_list_query(index)
+        return await to_thread.run_sync(self._get_project_list, sql, params, limiter=self._limiter)
 
-        return await to_thread.run_sync(run, limiter=self._limiter)
+    def _get_project_list(self, sql: str, params: tuple[str, ...]) -> ProjectList:
+        with self._get_connection() as con:
+            rows = con.execute(sql, params).fetchall()
+        return ProjectList(projects=[Project(name) for (name,) in rows])
 
     async def get_project_detail(self, project: NormalizedName, index: str) -> ProjectDetail:
-        def run() -> ProjectDetail:
-            detail = ProjectDetail(name=project)
-            with self._get_connection() as con:
-                cursor = con.execute(GET_PROJECT_DETAIL, (project, _path_pattern(index)))
-                for version, dist in cursor:
-                    detail.versions.append(version)
-                    detail.files.append(dist)
-            detail.versions = sorted(set(detail.versions))
-            return detail
+        sql, params = _project_detail_query(index)
+        # fetch raw blobs on the DB thread, decode here to release it sooner
+        rows = await to_thread.run_sync(
+            self._get_project_detail_rows, sql, (project, *params), limiter=self._limiter
+        )
+        decode = _PROJECT_FILE_DECODER.decode
+        return ProjectDetail(
+            name=project,
+            versions=sorted({version for version, _ in rows}),
+            files=[decode(blob) for _, blob in rows],
+        )
 
-        return await to_thread.run_sync(run, limiter=self._limiter)
+    def _get_project_detail_rows(self, sql: str, params: tuple[str, ...]) -> list[tuple[str, bytes]]:
+        with self._get_connection() as con:
+            return con.execute(sql, params).fetchall()
 
     async def distribution_exists(self, filename: str) -> bool:
-        def run() -> bool:
-            with self._get_connection() as con:
-                return con.execute(CHECK_DIST_EXISTS, (filename,)).fetchone() is not None
+        return await to_thread.run_sync(self._distribution_exists, filename, limiter=self._limiter)
+
+    def _distribution_exists(self, filename: str) -> bool:
+        with self._get_connection() as con:
+            return con.execute(CHECK_DIST_EXISTS, (filename,)).fetchone() is not None
+
+
+@lru_cache(maxsize=256)
+def _index_bounds(prefix: str) -> tuple[str, str]:
+    """half-open key range covering an index and everything nested below it"""
+    # "0" is the codepoint after "/", so every key starting with "prefix/"
+    # sorts below "prefix0" regardless of what follows the slash
+    return f"{prefix}/", f"{prefix}0"
+
+
+@lru_cache(maxsize=256)
+def _project_list_query(prefix: str) -> tuple[str, tuple[str, ...]]:
+    if not prefix:  # root index: no range filter at all
+        return GET_PROJECT_LIST_ALL, ()
+    return GET_PROJECT_LIST, _index_bounds(prefix)
 
-        return await to_thread.run_sync(run, limiter=self._limiter)
 
+@lru_cache(maxsize=256)
+def _project_detail_query(prefix: str) -> tuple[str, tuple[str, ...]]:
+    if not prefix:  # root index: no range filter at all
+        return GET_PROJECT_DETAIL_ALL, ()
+    return GET_PROJECT_DETAIL, _index_bounds(prefix)
 
-def _path_pattern(prefix: str) -> str:
-    return f"{prefix}/*" if prefix else "*"
+
+@lru_cache(maxsize=256)
+def _index_ancestors(index: str) -> tuple[str, ...]:
+    """all enclosing index names of e.g. 'a/b/', outermost ('', the root) last: ('a/b', 'a', '')"""
+    ancestors = []
+    while index:
+        index = index.rpartition("/")[0]
+        ancestors.append(index)
+    return tuple(ancestors)
 
 
 def _add_new(
@@ -235,12 +314,26 @@ def _add_new(
     project_file_reader: ProjectFileReader,
     static_files: StaticFilesDirGenerator,
 ) -> None:
-    for index, file in project_file_reader:
-        known: list[tuple[str, str]] = con.execute(CHECK_DIST, (file.name,)).fetchall()
-        if any(i == index for i, _ in known):
-            continue
+    known_by_name: dict[str, list[tuple[str, str]]] = {}
+    for filename, index, hash in con.execute(LIST_DISTS):
+        known_by_name.setdefault(filename, []).append((index, hash))
+
+    candidates = [
+        (index, file)
+        for index, file in project_file_reader
+        if not any(i == index for i, _ in known_by_name.get(file.name, []))
+    ]
+
+    # hashing dominates the scan and hashlib releases the GIL, so read
+    # the new files on a pool and process the results in scan order
+    with ThreadPoolExecutor() as executor:
+        futures = [executor.submit(project_file_reader.read, file) for _, file in candidates]
+
+    store_dist_parameters = []
+    for (index, file), future in zip(candidates, futures):
+        known = known_by_name.get(file.name, [])
         try:
-            file_info = project_file_reader.read(file)
+            file_info = future.result()
         except UnhandledFileTypeError:
             logger.debug("Ignoring %s", file)
             continue
@@ -255,37 +348,51 @@ def _add_new(
 
         logger.info("Adding %s", file)
         file_info.dist.url = static_files.add(file, file_info.hash, file_info.metadata)
-        parameters = (
-            index,
-            file.name,
-            file_info.hash,
-            file_info.project,
-            file_info.version,
-            file_info.dist,
+        store_dist_parameters.append(
+            (
+                index,
+                file.name,
+                file_info.hash,
+                file_info.project,
+                file_info.version,
+                file_info.dist,
+            )
         )
-        con.execute(STORE_DIST, parameters)
+        known_by_name.setdefault(file.name, []).append((index, file_info.hash))
+
+    con.executemany(STORE_DIST, store_dist_parameters)
+
+
+def _remove_missing(
+    con: sqlite3.Connection,
+    project_file_reader: ProjectFileReader,
+    static_files: StaticFilesDirGenerator,
+) -> None:
+    # one directory sweep instead of a stat syscall per database row
+    present = {(index, file.name) for index, file in project_file_reader}
+    base_dir = project_file_reader.base_dir
 
+    rows_by_filename: dict[str, list[tuple[str, str]]] = {}
+    for filename, index, hash in con.execute(LIST_DISTS):
+        rows_by_filename.setdefault(filename, []).append((index, hash))
 
-def _remove_missing(con: sqlite3.Connection, base_dir: Path, static_files: StaticFilesDirGenerator) -> None:
     remove_dist_parameters = []
     files_to_check = []
 
-    filename: str
-    index: str
-    hash: str
-    for filename, index, hash in con.execute(LIST_DISTS):
-        file = base_dir.joinpath(index.rstrip("/"), filename)
-        if not file.exists():
-            logger.info("Removing %s", file)
-            remove_dist_parameters.append((filename, index))
-            files_to_check.append((filename, hash))
+    for filename, rows in rows_by_filename.items():
+        for index, hash in rows:
+            if (index, filename) not in present:
+                logger.info("Removing %s", base_dir.joinpath(index.rstrip("/"), filename))
+                remove_dist_parameters.append((filename, index))
+                files_to_check.append((filename, hash))
 
     con.executemany(REMOVE_DIST, remove_dist_parameters)
 
     for filename, hash in files_to_check:
-        if index_hash := con.execute(CHECK_DIST, (filename,)).fetchone():
+        survivors = (i for i, _ in rows_by_filename[filename] if (i, filename) in present)
+        if index := next(survivors, None):
             # use file from other index
-            file = base_dir.joinpath(index_hash[0].rstrip("/"), filename)
+            file = base_dir.joinpath(index.rstrip("/"), filename)
             static_files.update_link(file, hash)
         else:
             static_files.remove(static_files.url_path(filename, hash))
@@ -1,14 +1,17 @@
 import asyncio
 import hashlib
 import logging
+import mmap
 import os
+import struct
+import zlib
 from collections.abc import Awaitable, Callable, Iterator
 from dataclasses import KW_ONLY, dataclass, field
-from datetime import UTC, datetime
 from fnmatch import fnmatch
+from io import BufferedReader
 from pathlib import Path
 from tarfile import TarFile
-from time import time
+from time import gmtime, strftime, time
 from zipfile import ZipFile
 
 import watchfiles
@@ -38,34 +41,103 @@ class InvalidFileError(ValueError):
     pass
 
 
-def read_project_metadata(file: Path) -> bytes:
+_ZIP_EOCD = b"PK\x05\x06"
+_ZIP_CENTRAL_DIR_ENTRY = struct.Struct("<4sHHHHHHIIIHHHHHII")
+
+
+def _read_zip_member(fp: BufferedReader, member: str) -> bytes | None:
+    """single-member zip extraction without ZipFile's full central-directory parse
+
+    Returns None when the archive needs the general-purpose code path (zip64 etc.).
+    """
+    wanted = member.encode()
+    file_size = fp.seek(0, os.SEEK_END)
+    tail_size = min(file_size, 65536 + 22)
+    fp.seek(file_size - tail_size)
+    tail = fp.read(tail_size)
+    eocd = tail.rfind(_ZIP_EOCD)
+    if eocd < 0:
+        return None
+    num_entries, cd_size, cd_offset = struct.unpack_from("<HII", tail, eocd + 10)
+    if num_entries == 0xFFFF or cd_offset == 0xFFFFFFFF:
+        return None  # zip64
+
+    fp.seek(cd_offset)
+    central_dir = fp.read(cd_size)
+    pos = 0
+    for _ in range(num_entries):
+        (
+            sig,
+            _,
+            _,
+            _,
+            method,
+            _,
+            _,
+            _,
+            compressed_size,
+            _,
+            name_len,
+            extra_len,
+            comment_len,
+            *_,
+            local_offset,
+        ) = _ZIP_CENTRAL_DIR_ENTRY.unpack_from(central_dir, pos)
+        if sig != b"PK\x01\x02":
+            return None
+        name_end = pos + 46 + name_len
+        if central_dir[pos + 46 : name_end] == wanted:
+            if method not in (0, 8) or local_offset == 0xFFFFFFFF:
+                return None
+            fp.seek(local_offset + 26)  # name/extra lengths in the local header
+            local_name_len, local_extra_len = struct.unpack("<HH", fp.read(4))
+            fp.seek(local_offset + 30 + local_name_len + local_extra_len)
+            raw = fp.read(compressed_size)
+            return zlib.decompress(raw, -15) if method == 8 else raw
+        pos = name_end + extra_len + comment_len
+    return None
+
+
+def read_project_metadata(file: Path, fp: BufferedReader) -> bytes:
     if file.suffix == ".whl":
         parse_wheel_filename(file.name)
         # https://packaging.python.org/en/latest/specifications/binary-distribution-format/
         distribution, version, _ = file.name.split("-", 2)
         subdir = f"{distribution}-{version}.dist-info"
-        with ZipFile(file) as zip, zip.open(f"{subdir}/METADATA") as fp:
-            return fp.read()
+        if (metadata := _read_zip_member(fp, f"{subdir}/METADATA")) is not None:
+            return metadata
+        fp.seek(0)
+        with ZipFile(fp) as zip, zip.open(f"{subdir}/METADATA") as member_fp:
+            return member_fp.read()
 
     elif file.name.endswith(".tar.gz"):
         parse_sdist_filename(file.name)
         # https://packaging.python.org/en/latest/specifications/source-distribution-format/
-        subdir = file.name.removesuffix(".tar.gz")
-        with TarFile.open(file) as tar_file:
-            pkg_info = tar_file.extractfile(f"{subdir}/PKG-INFO")
-            assert pkg_info
-            with pkg_info as fp:
-                return fp.read()
+        member = f"{file.name.removesuffix('.tar.gz')}/PKG-INFO"
+        with TarFile.open(fileobj=fp) as tar_file:
+            # stop decompressing once PKG-INFO is found (usually the first member)
+            # instead of indexing the whole archive via extractfile(name)
+            for tar_info in tar_file:
+                if tar_info.name == member:
+                    pkg_info = tar_file.extractfile(tar_info)
+                    assert pkg_info
+                    with pkg_info as member_fp:
+                        return member_fp.read()
+            raise KeyError(f"filename {member!r} not found")
 
     raise UnhandledFileTypeError(f"Can't handle type {file.name}")
 
 
-def _get_file_hashes(filename: Path, blocksize: int = 2 << 13) -> Hashes:
-    hash_obj = hashlib.sha256()
-    with open(filename, "rb") as fp:
-        while fb := fp.read(blocksize):
-            hash_obj.update(fb)
-    return Hashes(sha256=hash_obj.hexdigest())
+_MMAP_THRESHOLD = 4 * 1024 * 1024
+
+
+def _get_file_hashes(fp: BufferedReader) -> Hashes:
+    if os.fstat(fp.fileno()).st_size > _MMAP_THRESHOLD:
+        # hash straight out of the page cache instead of copying through read()
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+            return Hashes(sha256=hashlib.sha256(memoryview(mm)).hexdigest())
+    return Hashes(sha256=hashlib.file_digest(fp, "sha256").hexdigest())
 
 
 @dataclass(frozen=True, slots=True)
@@ -84,42 +156,60 @@ class ProjectFileReader:
     ignore_dirs: set[Path] = field(default_factory=set)
 
     def __iter__(self) -> Iterator[tuple[str, Path]]:
-        for root, _, files in os.walk(self.base_dir):
-            root_dir = Path(root)
-            if not self.ignore_dirs.isdisjoint(root_dir.parents):
+        base_dir = str(self.base_dir)
+        ignore_dirs = {str(path) for path in self.ignore_dirs}
+        directories = [base_dir]
+        while directories:
+            directory = directories.pop()
+            # files directly in an ignored directory are still reported,
+            # but nothing below it is traversed (matches os.walk + parents check)
+            descend = directory not in ignore_dirs
+            index = f"{directory[len(base_dir) + 1 :].replace(os.sep, '/')}/"
+            try:
+                entries = os.scandir(directory)
+            except OSError as e:  # skip unreadable directories like os.walk did
+                logger.warning("Cannot scan %s: %s", directory, e)
                 continue
-            index = f"{root_dir.relative_to(self.base_dir).as_posix()}/".lstrip(".")
-            for file in files:
-                yield index, root_dir / file
+            with entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if descend and not entry.is_symlink():
+                            directories.append(entry.path)
+                    else:
+                        yield index, Path(entry.path)
 
     def read(self, file: Path) -> FileResult:
         try:
-            metadata_content = read_project_metadata(file)
-            metadata, _ = parse_email(metadata_content)
-            project = canonicalize_name(metadata["name"])
-            version = canonicalize_version(metadata["version"])
+            # one open file for metadata extraction and content hashing
+            with open(file, "rb") as fp:
+                metadata_content = read_project_metadata(file, fp)
+                metadata, _ = parse_email(metadata_content)
+                project = canonicalize_name(metadata["name"])
+                version = canonicalize_version(metadata["version"])
+                fp.seek(0)
+                hashes = _get_file_hashes(fp)
         except ProjectReaderError:
             raise
         except Exception as e:
             raise InvalidFileError(file) from e
 
-        hashes = _get_file_hashes(file)
+        stat = file.stat()
 
         dist = ProjectFile(
             filename=file.name,
-            size=file.stat().st_size,
+            size=stat.st_size,
             url="",  # filled later
             hashes=hashes,
             requires_python=metadata.get("requires_python"),
             core_metadata=Hashes(sha256=hashlib.sha256(metadata_content).hexdigest()),
-            upload_time=_format_time(file.stat().st_mtime),
+            upload_time=_format_time(stat.st_mtime),
         )
         return FileResult(project, version, hashes.sha256, dist, metadata_content)
 
 
 def _format_time(timestamp: float) -> str:
     """generate a ISO 8601 / RFC 3339 from timestamp"""
-    return datetime.fromtimestamp(timestamp, UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return strftime("%Y-%m-%dT%H:%M:%SZ", gmtime(timestamp))
 
 
 @dataclass
@@ -133,6 +223,7 @@ class FileWatcher:
 
     def __post_init__(self) -> None:
         self._next_callback_time: float | None = None
+        self._change_event = asyncio.Event()
         self._files_changed: set[Path] = set()
         self._watch_task = asyncio.create_task(self._run_watch())
 
@@ -143,6 +234,7 @@ class FileWatcher:
                 asyncio.create_task(self._run_callback())
             self._next_callback_time = time() + self.quiet_time
             self._files_changed.update(Path(s) for c, s in changes)
+            self._change_event.set()
 
     def _watch_filter(self, change: watchfiles.Change, file: str) -> bool:
         filepath = Path(file)
@@ -154,9 +246,17 @@ class FileWatcher:
 
     async def _run_callback(self) -> None:
         try:
-            while not self._next_callback_time or time() < self._next_callback_time:
-                await asyncio.sleep(1)
-                continue
+            # sleep until quiet_time has passed without changes; each new
+            # change batch sets the event and re-arms the timeout
+            while (next_callback_time := self._next_callback_time) is not None:
+                self._change_event.clear()
+                if (delay := next_callback_time - time()) <= 0:
+                    break
+                try:
+                    async with asyncio.timeout(delay):
+                        await self._change_event.wait()
+                except TimeoutError:
+                    break
 
             files_changed = set(self._files_changed)
             self._files_changed.clear()
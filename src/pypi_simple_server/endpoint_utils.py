@@ -1,9 +1,8 @@
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping
 from dataclasses import dataclass
 from email.utils import formatdate, parsedate
 from enum import StrEnum
 from functools import lru_cache
-from hashlib import md5
 from typing import Self
 
 import msgspec
@@ -17,7 +16,7 @@ from starlette.status import (
     HTTP_412_PRECONDITION_FAILED,
 )
 
-from .templates import TemplateResponse
+from .templates import get_template
 
 
 class MediaType(StrEnum):
@@ -75,21 +74,32 @@ def _parse_accept_entry(value: str) -> tuple[float, int, str]:
     return priority, specificity, type_
 
 
-@lru_cache
+@lru_cache(maxsize=256)  # bounded: the header value is client-controlled
 def get_response_media_type(accept_header: str | None) -> MediaType:
     """https://packaging.python.org/en/latest/specifications/simple-repository-api/#version-format-selection"""
-    accepts = list(_parse_accept_entry(mt) for mt in (accept_header or "*/*").split(","))
-    for *_, accept in sorted(accepts, reverse=True):
-        if media_type := _ACCEPTABLE.get(accept):
-            return media_type
-    raise HTTPException(HTTP_406_NOT_ACCEPTABLE)
+    # common case: a single media type without q-factors
+    if media_type := _ACCEPTABLE.get(accept_header or "*/*"):
+        return media_type
+    best: tuple[float, int, str] | None = None
+    best_media_type = None
+    for token in (accept_header or "*/*").split(","):
+        entry = _parse_accept_entry(token)
+        if (media_type := _ACCEPTABLE.get(entry[2])) and (best is None or entry > best):
+            best = entry
+            best_media_type = media_type
+    if best_media_type is None:
+        raise HTTPException(HTTP_406_NOT_ACCEPTABLE)
+    return best_media_type
 
 
 class ResponseHeaders(MutableHeaders):
+    etag: ETag  # parsed form, computed once per database update
+
     def update_changed(self, mtime: float) -> None:
         self["last-modified"] = formatdate(mtime, usegmt=True)
-        etag = ETag(f'"{md5(str(mtime).encode(), usedforsecurity=False).hexdigest()}"')
-        self["etag"] = str(etag)
+        # the etag only needs to be unique per update; the mtime itself is
+        self.etag = ETag(f'"{int(mtime * 1e6):x}"')
+        self["etag"] = str(self.etag)
 
 
 def _parse_etags(value: str) -> tuple[bool, list[ETag]]:
@@ -105,9 +115,14 @@ def _parse_etags(value: str) -> tuple[bool, list[ETag]]:
     return has_wildcard, tags
 
 
-def handle_conditional_request(request_headers: Headers, response_headers: Headers) -> None:
-    current_etag = ETag.from_header(response_headers["etag"])
-    assert current_etag is not None
+def handle_conditional_request(request_headers: Headers, response_headers: ResponseHeaders) -> None:
+    current_etag = response_headers.etag
+
+    # fast path: clients usually echo our etag header back verbatim
+    # (If-Match has precedence and still needs the full evaluation)
+    if "if-match" not in request_headers:
+        if (if_none_match := request_headers.get("if-none-match")) and if_none_match == str(current_etag):
+            raise HTTPException(HTTP_304_NOT_MODIFIED, headers=response_headers)
 
     try:
         has_wildcard, match_etags = _parse_etags(request_headers["if-match"])
@@ -133,6 +148,22 @@ def handle_conditional_request(request_headers: Headers, response_headers: Heade
         pass
 
 
+_json_encoder = msgspec.json.Encoder()
+# (etag, media type or template, base_url, path) -> body; all entries share the current etag
+_body_cache: dict[tuple[str, str, str, str], bytes] = {}
+_BODY_CACHE_MAX = 256  # bounded: the host and path in the key are client-controlled
+
+
+def _get_cached_body(key: tuple[str, str, str, str], render: Callable[[], bytes]) -> bytes:
+    if (body := _body_cache.get(key)) is None:
+        if _body_cache and next(iter(_body_cache))[0] != key[0]:
+            _body_cache.clear()  # database changed, all cached bodies are stale
+        elif len(_body_cache) >= _BODY_CACHE_MAX:
+            del _body_cache[next(iter(_body_cache))]
+        body = _body_cache[key] = render()
+    return body
+
+
 def get_response(
     request: Request,
     headers: Mapping[str, str],
@@ -140,16 +171,20 @@ def get_response(
     template: str,
 ) -> Response:
     media_type = get_response_media_type(request.headers.get("accept"))
+    key = (headers.get("etag", ""), str(media_type), str(request.base_url), request.url.path)
     if media_type.endswith("html"):
-        return TemplateResponse(
-            request,
-            template,
-            context={"model": model},
-            headers=headers,
-            media_type=media_type,
-        )
-    return Response(
-        msgspec.json.encode(model),
-        headers=headers,
-        media_type=MediaType.JSON_V1,
-    )
+        body = _get_cached_body(key, lambda: get_template(template).render(model=model).encode())
+    else:
+        body = _get_cached_body(key, lambda: _json_encoder.encode(model))
+    return Response(body, headers=headers, media_type=media_type)
+
+
+def get_template_response(
+    request: Request,
+    headers: Mapping[str, str],
+    template: str,
+    context: dict,
+) -> Response:
+    key = (headers.get("etag", ""), template, str(request.base_url), request.url.path)
+    body = _get_cached_body(key, lambda: get_template(template).render(context).encode())
+    return Response(body, headers=headers, media_type="text/html")
@@ -1,8 +1,9 @@
 import logging
+import re
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from packaging.utils import canonicalize_name
+from packaging.utils import NormalizedName, canonicalize_name
 from starlette.applications import Starlette
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
@@ -10,13 +11,18 @@ from starlette.responses import PlainTextResponse, RedirectResponse, Response
 from starlette.routing import Mount, Route
 from starlette.staticfiles import StaticFiles
 from starlette.status import HTTP_404_NOT_FOUND
+from starlette.types import Receive, Scope, Send
 
 from .config import BASE_DIR, CACHE_FILE, FILES_DIR, PICOCSS_URL
 from .database import Database
 from .dist_scanner import FileWatcher, ProjectFileReader
-from .endpoint_utils import ResponseHeaders, get_response, handle_conditional_request
+from .endpoint_utils import (
+    ResponseHeaders,
+    get_response,
+    get_template_response,
+    handle_conditional_request,
+)
 from .static_files_gen import StaticFilesDirGenerator
-from .templates import TemplateResponse
 from .uploader import legacy_upload
 
 logger = logging.getLogger(__name__)
@@ -37,6 +43,16 @@ if not logging.root.hasHandlers():  # pragma: no cover
     logging.getLogger(__package__).setLevel(logging.INFO)
 
 
+_NOT_CANONICAL = re.compile(r"[_.]|--|^-|-$").search
+
+
+def _canonicalize(project_raw: str) -> NormalizedName:
+    if project_raw.islower() and _NOT_CANONICAL(project_raw) is None:
+        # already canonical (the common case): skip canonicalize_name's regex
+        return NormalizedName(project_raw)
+    return canonicalize_name(project_raw)
+
+
 async def simple_index(request: Request) -> Response:
     handle_conditional_request(request.headers, response_headers)
     index: str = request.path_params.get("index", "")
@@ -55,7 +71,7 @@ async def simple_detail(request: Request) -> Response:
     project_raw: str = request.path_params["project"]
     database: Database = request.state.database
 
-    project = canonicalize_name(project_raw)
+    project = _canonicalize(project_raw)
     if project_raw != project:
         url = request.url.path.replace(project_raw, project)
         return RedirectResponse(url, status_code=301)
@@ -63,14 +79,19 @@ async def simple_detail(request: Request) -> Response:
     project_details = await database.get_project_detail(project, index)
     if not project_details.files:
         raise HTTPException(HTTP_404_NOT_FOUND)
+    files_url_prefix = str(request.url_for("files", path=""))
     for project_file in project_details.files:
-        project_file.url = str(request.url_for("files", path=project_file.url))
+        project_file.url = files_url_prefix + project_file.url
 
     return get_response(request, response_headers, project_details, "simple_detail.html")
 
 
+_PING_RESPONSE = PlainTextResponse("", headers={"Cache-Control": "no-store"})
+
+
 async def ping(request: Request) -> PlainTextResponse:
-    return PlainTextResponse("", headers={"Cache-Control": "no-store"})
+    # Starlette responses are immutable ASGI apps, so one instance serves all
+    return _PING_RESPONSE
 
 
 async def web_index(request: Request) -> Response:
@@ -98,7 +119,7 @@ async def web_index(request: Request) -> Response:
         },
         "stats_per_index": stats_per_index,
     }
-    return TemplateResponse(request, "web_index.html", context=context, headers=response_headers)
+    return get_template_response(request, response_headers, "web_index.html", context)
 
 
 async def web_project(request: Request) -> Response:
@@ -107,7 +128,7 @@ async def web_project(request: Request) -> Response:
     project_raw: str = request.path_params["project"]
     database: Database = request.state.database
 
-    project = canonicalize_name(project_raw)
+    project = _canonicalize(project_raw)
     if project_raw != project:
         url = request.url.path.replace(project_raw, project)
         return RedirectResponse(url, status_code=301)
@@ -115,8 +136,9 @@ async def web_project(request: Request) -> Response:
     project_details = await database.get_project_detail(project, index)
     if not project_details.files:
         raise HTTPException(HTTP_404_NOT_FOUND)
+    files_url_prefix = str(request.url_for("files", path=""))
     for project_file in project_details.files:
-        project_file.url = str(request.url_for("files", path=project_file.url))
+        project_file.url = files_url_prefix + project_file.url
 
     index_href = request.url_for("web_index", index=index) if index else request.url_for("web_index_root")
     context = {
@@ -125,7 +147,7 @@ async def web_project(request: Request) -> Response:
         "index": ({"name": index, "href": index_href}),
         "project": project_details,
     }
-    return TemplateResponse(request, "web_project.html", context=context, headers=response_headers)
+    return get_template_response(request, response_headers, "web_project.html", context)
 
 
 @asynccontextmanager
@@ -176,4 +198,17 @@ routes = [
     Route("/ping", endpoint=ping),
 ]
 
-app = Starlette(routes=routes, lifespan=lifespan)
+starlette_app = Starlette(routes=routes, lifespan=lifespan)
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    # health checks are by far the most frequent request: answer them before
+    # the router's linear regex walk; everything else takes the normal path
+    if (
+        scope["type"] == "http"
+        and scope["method"] in ("GET", "HEAD")
+        and scope["path"] == f"{scope.get('root_path', '')}/ping"
+    ):
+        await _PING_RESPONSE(scope, receive, send)
+        return
+    await starlette_app(scope, receive, send)
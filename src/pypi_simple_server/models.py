@@ -4,10 +4,11 @@ Model for Simple Index data
 https://packaging.python.org/en/latest/specifications/simple-repository-api/
 """
 
+from functools import lru_cache
 from typing import Annotated
 
 from msgspec import Meta as M
-from msgspec import Struct
+from msgspec import Struct, field
 from packaging.utils import NormalizedName, Version
 
 # https://peps.python.org/pep-0508/#names
@@ -24,7 +25,7 @@ class Hashes(Struct):
     sha256: str
 
 
-class ProjectFile(Struct, omit_defaults=True, rename="kebab"):
+class ProjectFile(Struct, omit_defaults=True, rename="kebab", gc=False):
     # PEP-503
     filename: str
     # PEP-700
@@ -46,13 +47,18 @@ class ProjectFile(Struct, omit_defaults=True, rename="kebab"):
 
     @property
     def version(self) -> Version:
-        try:
-            return Version(self.filename.split("-", 3)[1].removesuffix(".tar.gz"))
-        except Exception:
-            return Version("?")
+        return _parse_version(self.filename)
 
 
-class ProjectDetail(Struct, kw_only=True):
+@lru_cache(maxsize=1024)
+def _parse_version(filename: str) -> Version:
+    try:
+        return Version(filename.split("-", 3)[1].removesuffix(".tar.gz"))
+    except Exception:
+        return Version("?")
+
+
+class ProjectDetail(Struct, kw_only=True, gc=False):
     """details on project - /simple/$NORM_NAME/"""
 
     # PEP-629
@@ -60,20 +66,20 @@ class ProjectDetail(Struct, kw_only=True):
     # PEP-691
     name: NormalizedProjectName
     # PEP-700
-    versions: list[str] = list()
+    versions: list[str] = field(default_factory=list)
     # PEP-503
-    files: list[ProjectFile] = list()
+    files: list[ProjectFile] = field(default_factory=list)
 
 
-class Project(Struct):
+class Project(Struct, gc=False):
     # PEP-691
     name: ProjectName  # may be normalized
 
 
-class ProjectList(Struct):
+class ProjectList(Struct, gc=False):
     """list of project names, a.k.a. project index - /simple/"""
 
     # PEP-629
     meta: Meta = Meta()
     # PEP-503
-    projects: list[Project] = list()
+    projects: list[Project] = field(default_factory=list)
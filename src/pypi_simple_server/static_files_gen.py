@@ -10,11 +10,10 @@ class StaticFilesDirGenerator:
 
     def __post_init__(self):
         self.directory.mkdir(parents=True, exist_ok=True)
+        self._created_dirs: set[Path] = set()
 
     def _files(self, url_path: str) -> tuple[Path, Path]:
-        dist_file = self.directory / url_path
-        metadata_file = dist_file.with_name(dist_file.name + ".metadata")
-        return dist_file, metadata_file
+        return self.directory / url_path, self.directory / f"{url_path}.metadata"
 
     def url_path(self, filename: str, hash: str) -> str:
         return f"{hash[:2]}/{filename}"
@@ -23,21 +22,23 @@ class StaticFilesDirGenerator:
         url_path = self.url_path(file.name, hash)
 
         dist_file, metadata_file = self._files(url_path)
-        dist_file.parent.mkdir(parents=True, exist_ok=True)
+        if (parent := dist_file.parent) not in self._created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(parent)
         with suppress(FileExistsError):
-            dist_file.symlink_to(_relative_to(file, dist_file.parent))
+            os.symlink(_relative_to(file, dist_file.parent), dist_file)
 
             metadata_file.write_bytes(metadata)
-            stat = file.stat()
-            os.utime(metadata_file, (stat.st_atime, stat.st_mtime))
+            stat = os.stat(file)
+            os.utime(metadata_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
 
         return url_path
 
     def update_link(self, file: Path, hash: str) -> None:
         dist_file, metadata_file = self._files(self.url_path(file.name, hash))
-        dist_file.unlink()
-        dist_file.symlink_to(_relative_to(file, dist_file.parent))
-        stat = file.stat()
+        os.unlink(dist_file)
+        os.symlink(_relative_to(file, dist_file.parent), dist_file)
+        stat = os.stat(file)
         os.utime(metadata_file, (stat.st_atime, stat.st_mtime))
 
     def remove(self, url_path: str) -> None:
@@ -47,10 +48,4 @@ class StaticFilesDirGenerator:
 
 
 def _relative_to(file: Path, dir: Path) -> Path:
-    up = Path()
-    for parent in (dir / "dummy").parents:
-        if parent in file.parents:
-            return up / file.relative_to(parent)
-        up /= ".."
-
-    raise ValueError("No common path found")  # pragma: no cover
+    return Path(os.path.relpath(file, dir))
@@ -1,9 +1,22 @@
+from functools import lru_cache
 from pathlib import Path
 
 import humanize
+from jinja2 import FileSystemBytecodeCache
 from starlette.templating import Jinja2Templates
 
-_templates = Jinja2Templates(Path(__file__).parent)
-_templates.env.filters["naturalsize"] = humanize.naturalsize
+_template_dir = Path(__file__).parent
+_templates = Jinja2Templates(_template_dir)
+# templates ship with the package: persist compiled code across restarts
+# (default cache location: the system temp dir) and skip per-render mtime checks
+_templates.env.bytecode_cache = FileSystemBytecodeCache()
+_templates.env.auto_reload = False
+# file sizes repeat heavily across pages, and humanize does locale work per call
+_templates.env.filters["naturalsize"] = lru_cache(maxsize=1024)(humanize.naturalsize)
 
 TemplateResponse = _templates.TemplateResponse
+get_template = _templates.get_template
+
+# compile everything at import so no request pays the first-render spike
+for _template_file in sorted(_template_dir.glob("*.html")):
+    get_template(_template_file.name)
@@ -1,4 +1,5 @@
 import asyncio
+import os
 import shutil
 from collections.abc import Iterator
 from contextlib import contextmanager
@@ -34,9 +35,17 @@ class Context:
         return {f.relative_to(self.files.directory).as_posix() for f in self.files.directory.rglob("*.*")}
 
 
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:  # tmp_path may live on another filesystem
+        shutil.copy2(src, dst)
+
+
 @pytest.fixture
 def context(downloads: Path, tmp_path: Path) -> Iterator[Context]:
-    shutil.copytree(downloads, tmp_path, dirs_exist_ok=True)
+    # hard links avoid re-copying the wheel data for every test
+    shutil.copytree(downloads, tmp_path, dirs_exist_ok=True, copy_function=_link_or_copy)
 
     files = StaticFilesDirGenerator(tmp_path / "files")
     reader = ProjectFileReader(tmp_path, ignore_dirs={files.directory})
@@ -72,12 +81,12 @@ DEFAULT_FILES = {
 
 @contextmanager
 def rename_files(files: list[Path]) -> Iterator[None]:
-    renamed = [file.with_name(file.name + "~") for file in files]
-    for file, backup in zip(files, renamed):
-        file.rename(backup)
+    pairs = [(str(file), f"{file}~") for file in files]
+    for file, backup in pairs:
+        os.rename(file, backup)
     yield
-    for backup, file in zip(renamed, files):
-        backup.rename(file)
+    for file, backup in pairs:
+        os.rename(backup, file)
 
 
 def test_static_files(context: Context):
@@ -153,6 +162,11 @@ def test_conflicting_dist(context: Context, caplog: pytest.LogCaptureFixture):
     with rename_files([dist_to_patch]):
         assert context.update() == expected_stats
 
+    # break the hard link to the shared download before modifying in place
+    dist_data = dist_to_patch.read_bytes()
+    dist_to_patch.unlink()
+    dist_to_patch.write_bytes(dist_data)
+
     with ZipFile(dist_to_patch, "a") as zip:
         zip.comment += b"XXXX"
 
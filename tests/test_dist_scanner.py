@@ -0,0 +1,58 @@
+import io
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from pypi_simple_server.dist_scanner import _ZIP_EOCD, _read_zip_member, read_project_metadata
+
+METADATA = b"Metadata-Version: 2.3\nName: demo\nVersion: 1.0\n"
+
+
+def _make_zip(members: dict[str, bytes], compression: int = ZIP_DEFLATED, comment: bytes = b"") -> bytes:
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w", compression) as zip:
+        for name, data in members.items():
+            zip.writestr(name, data)
+        zip.comment = comment
+    return buffer.getvalue()
+
+
+def _open(data: bytes) -> io.BufferedReader:
+    return io.BufferedReader(io.BytesIO(data))
+
+
+def _patch_to_zip64(data: bytes) -> bytes:
+    # set the EOCD entry count to the zip64 sentinel value
+    eocd = data.rfind(_ZIP_EOCD)
+    return data[: eocd + 10] + b"\xff\xff" + data[eocd + 12 :]
+
+
+def test_read_member_deflated():
+    data = _make_zip({"first.txt": b"0" * 1000, "demo-1.0.dist-info/METADATA": METADATA})
+    assert _read_zip_member(_open(data), "demo-1.0.dist-info/METADATA") == METADATA
+
+
+def test_read_member_stored():
+    data = _make_zip({"demo-1.0.dist-info/METADATA": METADATA}, compression=ZIP_STORED)
+    assert _read_zip_member(_open(data), "demo-1.0.dist-info/METADATA") == METADATA
+
+
+def test_read_member_with_archive_comment():
+    # the EOCD record is no longer the last thing in the file
+    data = _make_zip({"demo-1.0.dist-info/METADATA": METADATA}, comment=b"comment " * 100)
+    assert _read_zip_member(_open(data), "demo-1.0.dist-info/METADATA") == METADATA
+
+
+def test_read_member_missing():
+    data = _make_zip({"demo-1.0.dist-info/METADATA": METADATA})
+    assert _read_zip_member(_open(data), "demo-1.0.dist-info/RECORD") is None
+
+
+def test_read_member_zip64_bails_out():
+    data = _patch_to_zip64(_make_zip({"demo-1.0.dist-info/METADATA": METADATA}))
+    assert _read_zip_member(_open(data), "demo-1.0.dist-info/METADATA") is None
+
+
+def test_metadata_zipfile_fallback():
+    data = _patch_to_zip64(_make_zip({"demo-1.0.dist-info/METADATA": METADATA}))
+    file = Path("demo-1.0-py3-none-any.whl")
+    assert read_project_metadata(file, _open(data)) == METADATA